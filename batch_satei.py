@@ -0,0 +1,192 @@
+"""CSV / Parquet の物件リストを一括査定するバッチ処理。
+
+入力ファイルをチャンク単位で読み込み、チャンクごとに1回の predict で査定して
+結果を逐次書き出すため、行数が増えてもメモリ使用量は一定です。
+
+入力列: 区, 町名（または 所在）, 専有面積, 駅より徒歩, 築年月
+出力列: 入力列 + price, yield, range_max（app.py から親画面へ送る値と同じ）, error
+入力が欠けている・範囲外の行は査定せず、price などを空欄にして error 列に理由を書きます。
+
+使い方:
+    python batch_satei.py listings.csv result.csv
+    python batch_satei.py listings.parquet result.parquet --chunksize 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from satei_core import MODEL_PATH, INPUT_RANGES, predict_price, make_address, calc_yield, calc_range_max, load_model
+from satei_data import town_data
+
+DEFAULT_CHUNKSIZE = 10000
+NUMERIC_INPUT_COLUMNS = ('専有面積', '駅より徒歩', '築年月')
+TEXT_INPUT_COLUMNS = ('区', '町名', '所在')
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+
+def iter_chunks(path, chunksize=DEFAULT_CHUNKSIZE, dtype=None):
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        import pandas as pd
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=dtype)
+
+
+class _ChunkWriter:
+    # 出力形式（CSV / Parquet）の違いを吸収して、チャンクを追記していく
+    def __init__(self, path):
+        self.path = path
+        self._parquet = _is_parquet(path)
+        self._writer = None
+        self._first = True
+
+    @staticmethod
+    def _fixed_types(df):
+        # CSV はチャンクごとに型を推定するので（空欄があると int が float になる等）、
+        # Parquet のスキーマがチャンク間でずれないよう入力列の型をそろえる（それ以外の列は iter_chunks で文字列として読む）
+        import pandas as pd
+        df = df.copy()
+        for col in NUMERIC_INPUT_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        for col in TEXT_INPUT_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('string')
+        return df
+
+    def write(self, df):
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(self._fixed_types(df), preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+_KNOWN_TOWNS = {(ku, town) for ku, towns in town_data.items() for town in towns}
+
+
+def _known_addresses(model):
+    # 所在として受け付ける文字列：app.py と同じ「東京都{区}{町名}」と、モデルの学習時の語彙
+    addresses = {make_address(ku, town) for ku, town in _KNOWN_TOWNS}
+    if hasattr(model, 'address_codes'):            # ArrayPredictor
+        addresses.update(model.address_codes)
+    elif getattr(model, 'pandas_categorical', None):  # lightgbm.Booster
+        addresses.update(model.pandas_categorical[1])
+    return addresses
+
+
+def validate_frame(df, model=None):
+    """行ごとの入力チェック。問題のない行は空文字、それ以外は理由を入れた Series を返す。
+
+    町名は town_data（app.py の選択肢）に、所在はそれに加えてモデルの語彙にあるものだけを受け付ける。
+    """
+    import pandas as pd
+
+    error = pd.Series('', index=df.index, dtype=object)
+
+    def flag(mask, message):
+        error[mask & (error == '')] = message
+
+    def blank(col):
+        return df[col].isna() | (df[col].astype(str).str.strip() == '')
+
+    flag(~df['区'].isin(list(town_data)), "区が不正です")
+    if '所在' in df.columns:
+        flag(blank('所在'), "所在が空です")
+        flag(~df['所在'].isin(_known_addresses(model)), "所在が不正です")
+    else:
+        flag(blank('町名'), "町名が空です")
+        known = pd.Series([pair in _KNOWN_TOWNS for pair in zip(df['区'], df['町名'])], index=df.index)
+        flag(~known, "町名が不正です")
+    for col, name, label in (('専有面積', 'area', "専有面積"), ('駅より徒歩', 'walk', "駅より徒歩"),
+                             ('築年月', 'year', "築年月")):
+        lo, hi = INPUT_RANGES[name]
+        value = pd.to_numeric(df[col], errors='coerce')
+        flag(~value.between(lo, hi), f"{label}は {lo}〜{hi} の数値で指定してください")
+    return error
+
+
+def appraise_frame(model, df):
+    """DataFrame を査定し、price / yield / range_max / error 列を付けて返す。
+
+    入力が欠けている・範囲外の行は査定せず、結果を欠損値にして error 列に理由を入れる。
+    正常な行はまとめて1回の predict で査定する。
+    """
+    import pandas as pd
+
+    error = validate_frame(df, model)
+    ok = (error == '').to_numpy()
+    price = np.full(len(df), np.nan)
+    yield_rate = np.full(len(df), np.nan)
+    if ok.any():
+        valid = df[ok]
+        area, walk, year = (pd.to_numeric(valid[col]) for col in ('専有面積', '駅より徒歩', '築年月'))
+        address = valid['所在'] if '所在' in valid.columns else make_address(valid['区'], valid['町名'])
+        price[ok] = predict_price(model, valid['区'], address, area, walk, year)
+        yield_rate[ok] = calc_yield(valid['区'], area, year, price[ok])
+
+    out = df.copy()
+    out['price'] = pd.array(np.rint(price), dtype='Int64')
+    out['yield'] = np.round(yield_rate, 2)
+    out['range_max'] = pd.array(np.rint(calc_range_max(price)), dtype='Int64')
+    out['error'] = error
+    return out
+
+
+def appraise_file(src, dst, model=None, chunksize=DEFAULT_CHUNKSIZE, verbose=True):
+    """src を chunksize 行ずつ査定して dst に書き出す。処理件数と速度を dict で返す。"""
+    if model is None:
+        model = load_model(MODEL_PATH)
+
+    writer = _ChunkWriter(dst)
+    rows = 0
+    start = time.perf_counter()
+    try:
+        # CSV → Parquet では列の型をチャンク間で固定するため、全列を文字列で読む（数値の入力列は書き出し時に数値化）
+        dtype = str if _is_parquet(dst) and not _is_parquet(src) else None
+        for chunk in iter_chunks(src, chunksize, dtype):
+            writer.write(appraise_frame(model, chunk))
+            rows += len(chunk)
+            if verbose:
+                elapsed = time.perf_counter() - start
+                print(f"{rows:,} 件処理済み ({rows / elapsed:,.0f} 件/秒)", file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {'rows': rows, 'seconds': elapsed, 'rows_per_sec': rows / elapsed if elapsed else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CSV / Parquet の物件リストを一括査定します。")
+    parser.add_argument('src', help="入力ファイル（.csv / .parquet）")
+    parser.add_argument('dst', help="出力ファイル（.csv / .parquet）")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="1回の predict で処理する行数")
+    parser.add_argument('--model', default=MODEL_PATH, help="モデルファイルのパス")
+    parser.add_argument('-q', '--quiet', action='store_true', help="途中経過を表示しない")
+    args = parser.parse_args(argv)
+
+    stats = appraise_file(args.src, args.dst, model=load_model(args.model),
+                          chunksize=args.chunksize, verbose=not args.quiet)
+    print(f"完了: {stats['rows']:,} 件 / {stats['seconds']:.2f} 秒 ({stats['rows_per_sec']:,.0f} 件/秒)")
+
+
+if __name__ == '__main__':
+    main()
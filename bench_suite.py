@@ -0,0 +1,309 @@
+"""推論・住所解決・app.py の再実行までを通して計測するベンチマーク兼リグレッション検出。
+
+同梱の satei_model.pkl と town_data / ku_market_data から入力を作り、次の段階を計測します。
+    load_*          モデル読み込み（pickle / LightGBM テキスト形式）
+    predict_single  1件の predict_price（キャッシュを通さない）
+    batch_<N>       N 件を1回の predict_price で査定（1件あたりの時間と件数/秒）
+    resolve         住所文字列 → (区, 町名) の解決（1件あたり）
+    app_first_run   AppTest で app.py を初回実行（モデル読み込みを含む。1回だけなので閾値は別に緩く設定）
+    app_rerun       クエリパラメータを変えて app.py を再実行
+
+結果は環境情報（Python / ライブラリのバージョン、CPU、git のコミット等）と一緒に JSON に保存します。
+基準値（bench_baseline.json）と比べて、どれかの段階が閾値（既定 +25%）を超えて遅くなっていれば
+終了コード 1 で終わります。比較に使う値は、マイクロベンチマークは最小値（ノイズの影響が小さい）、
+app.py の再実行は中央値、初回実行は別の閾値（既定 +100%）です。基準値は計測したマシンでのみ意味があります。
+
+使い方:
+    python bench_suite.py                        # 計測して bench_result.json に保存し、基準値と比較
+    python bench_suite.py --threshold 0.5        # 50% 以上遅くなったら失敗
+    python bench_suite.py --save-baseline        # 今回の結果を基準値として保存
+    python bench_suite.py --skip app_first_run app_rerun
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = os.path.join(_HERE, 'satei_model.pkl')
+RESULT_PATH = os.path.join(_HERE, 'bench_result.json')
+BASELINE_PATH = os.path.join(_HERE, 'bench_baseline.json')
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_FIRST_RUN_THRESHOLD = 1.0
+BATCH_SIZES = (10, 100, 1000, 10000)
+SEED = 0
+
+
+def _timeit(fn, repeat, warmup=1):
+    # fn を warmup 回空回ししてから repeat 回計測し、中央値などの統計（秒）を返す
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {'seconds': times[len(times) // 2], 'min': times[0],
+            'p95': times[min(len(times) - 1, int(0.95 * len(times)))], 'runs': repeat}
+
+
+def _sample_units(n, rng):
+    # town_data から n 件の (区, 町名, 面積, 徒歩, 築年) を作る（入力範囲は app.py と同じ）
+    from satei_core import INPUT_RANGES
+    from satei_data import town_data
+
+    pairs = [(ku, town) for ku, towns in town_data.items() for town in towns]
+    idx = rng.integers(0, len(pairs), n)
+    ku = np.array([pairs[i][0] for i in idx], dtype=object)
+    town = np.array([pairs[i][1] for i in idx], dtype=object)
+    area, walk, year = (rng.integers(lo, hi + 1, n) for lo, hi in
+                        (INPUT_RANGES['area'], INPUT_RANGES['walk'], INPUT_RANGES['year']))
+    return ku, town, area, walk, year
+
+
+def bench_load(repeat):
+    from satei_core import LGB_MODEL_PATH, PICKLE_MODEL_PATH, load_model
+    results = {}
+    for name, path in (('load_pkl', PICKLE_MODEL_PATH), ('load_txt', LGB_MODEL_PATH)):
+        if os.path.exists(path):
+            results[name] = _timeit(lambda: load_model(path), repeat)
+    return results
+
+
+def bench_predict(model, repeat, sizes=BATCH_SIZES):
+    from satei_core import predict_price, make_address
+
+    rng = np.random.default_rng(SEED)
+    ku, town, area, walk, year = _sample_units(repeat, rng)
+    units = iter(range(10 ** 9))
+
+    def single():
+        i = next(units) % repeat
+        predict_price(model, ku[i], make_address(ku[i], town[i]), int(area[i]), int(walk[i]), int(year[i]))
+
+    results = {'predict_single': _timeit(single, repeat)}
+    for size in sizes:
+        b_ku, b_town, b_area, b_walk, b_year = _sample_units(size, rng)
+        address = make_address(b_ku, b_town)
+        runs = max(10, min(repeat, 200_000 // size))
+        stat = _timeit(lambda: predict_price(model, b_ku, address, b_area, b_walk, b_year), runs)
+        stat['rows'] = size
+        stat['rows_per_sec'] = size / stat['seconds']
+        results[f'batch_{size}'] = stat
+    return results
+
+
+def bench_resolve(repeat):
+    from satei_address import resolve_location
+    from satei_data import town_data, ku_market_data
+
+    # 「区＋町名」「町名のみ」「番地付き」「区のみ」を混ぜた住所文字列
+    texts = []
+    for ku in ku_market_data:
+        texts.append(ku)
+        for town in town_data[ku]:
+            texts += [f"{ku}{town}", town, f"東京都{ku}{town}１丁目２−３"]
+    random.Random(SEED).shuffle(texts)
+
+    def resolve_all():
+        for text in texts:
+            resolve_location(text)
+
+    stat = _timeit(resolve_all, max(5, repeat // 5))
+    stat['strings'] = len(texts)
+    stat['total_seconds'] = stat['seconds']
+    for key in ('seconds', 'min', 'p95'):
+        stat[key] /= len(texts)    # 1件あたりにそろえる
+    return {'resolve': stat}
+
+
+def bench_app(reruns):
+    from streamlit.testing.v1 import AppTest
+    from satei_data import town_data
+
+    rng = random.Random(SEED)
+    pairs = [(ku, town) for ku, towns in town_data.items() for town in towns]
+
+    def run_once():
+        # 毎回別の条件にして、査定・感度分析のキャッシュに当たらないようにする
+        ku, town = rng.choice(pairs)
+        at = AppTest.from_file(os.path.join(_HERE, 'app.py'), default_timeout=300)
+        at.query_params.update({'area': str(rng.randint(20, 150)), 'walk': str(rng.randint(0, 20)),
+                                'age': str(rng.randint(0, 40)), 'location': f"{ku}{town}"})
+        start = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - start
+        if at.exception or at.error or len(at.metric) < 2:
+            raise RuntimeError(f"app.py の実行に失敗しました（{ku}{town}）: "
+                               f"{[e.value for e in at.exception] + [e.value for e in at.error]}")
+        return elapsed
+
+    first = run_once()
+    results = {'app_first_run': {'seconds': first, 'min': first, 'p95': first, 'runs': 1}}
+    times = sorted(run_once() for _ in range(reruns))
+    results['app_rerun'] = {'seconds': times[len(times) // 2], 'min': times[0],
+                            'p95': times[min(len(times) - 1, int(0.95 * len(times)))], 'runs': reruns}
+    return results
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=_HERE, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=_HERE,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return out.stdout.strip() + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment(model_path):
+    from importlib.metadata import version, PackageNotFoundError
+    from satei_cache import file_hash
+
+    packages = {}
+    for name in ('numpy', 'pandas', 'lightgbm', 'streamlit'):
+        try:
+            packages[name] = version(name)
+        except PackageNotFoundError:
+            packages[name] = None
+    return {
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'packages': packages,
+        'git_commit': _git_commit(),
+        'model': os.path.basename(model_path),
+        'model_hash': file_hash(model_path)[:16],
+    }
+
+
+def run_suite(model_path, repeat=200, reruns=9, skip=()):
+    """全段階を計測して {'environment': ..., 'stages': {段階名: 統計}} を返す。"""
+    from satei_core import load_model
+
+    stages = {}
+
+    def want(*names):
+        return any(not any(name.startswith(s) for s in skip) for name in names)
+
+    if want('load_pkl', 'load_txt'):
+        stages.update(bench_load(max(5, repeat // 10)))
+    if want('predict_single', 'batch_'):
+        stages.update(bench_predict(load_model(model_path), repeat))
+    if want('resolve'):
+        stages.update(bench_resolve(repeat))
+    if want('app_first_run', 'app_rerun'):
+        stages.update(bench_app(reruns))
+    stages = {name: stat for name, stat in stages.items() if not any(name.startswith(s) for s in skip)}
+    return {'environment': environment(model_path), 'stages': stages}
+
+
+def gate_metric(name):
+    """比較に使う統計値。1回あたりが短いマイクロベンチマークは外れ値に強い最小値、app.py の実行は中央値。"""
+    return 'seconds' if name.startswith('app_') else 'min'
+
+
+def compare(result, baseline, threshold=DEFAULT_THRESHOLD, first_run_threshold=DEFAULT_FIRST_RUN_THRESHOLD):
+    """基準値より閾値（割合）を超えて遅くなった段階を [(段階名, 基準値, 今回, 比率)] で返す。"""
+    regressions = []
+    for name, stat in result['stages'].items():
+        base = baseline['stages'].get(name)
+        metric = gate_metric(name)
+        if base is None or base.get(metric, 0) <= 0:
+            continue
+        limit = first_run_threshold if name == 'app_first_run' else threshold
+        ratio = stat[metric] / base[metric]
+        if ratio > 1 + limit:
+            regressions.append((name, base[metric], stat[metric], ratio))
+    return regressions
+
+
+def _format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:,.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:,.2f} ms"
+    return f"{seconds:,.2f} s"
+
+
+def report(result, baseline=None):
+    # 比率は比較に使う値（最小値 or 中央値、gate_metric）どうしのもの
+    print(f"{'段階':<16}{'最小値':>14}{'中央値':>14}{'p95':>14}{'基準値':>14}{'比率':>8}")
+    for name, stat in result['stages'].items():
+        base = (baseline or {}).get('stages', {}).get(name)
+        metric = gate_metric(name)
+        extra = f"  ({stat['rows_per_sec']:,.0f} 件/秒)" if 'rows_per_sec' in stat else ''
+        base_col = _format_seconds(base[metric]) if base else '-'
+        ratio_col = f"{stat[metric] / base[metric]:.2f}" if base else '-'
+        print(f"{name:<16}{_format_seconds(stat['min']):>14}{_format_seconds(stat['seconds']):>14}"
+              f"{_format_seconds(stat['p95']):>14}{base_col:>14}{ratio_col:>8}{extra}")
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="査定処理のベンチマークとリグレッション検出")
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="計測に使うモデル（既定 satei_model.pkl）")
+    parser.add_argument('--out', default=RESULT_PATH, help="結果の保存先 JSON")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="比較する基準値の JSON")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="基準値からの許容悪化率（0.25 = 25%% 遅くなるまで許容）")
+    parser.add_argument('--first-run-threshold', type=float, default=DEFAULT_FIRST_RUN_THRESHOLD,
+                        help="app_first_run（1回だけの計測）の許容悪化率")
+    parser.add_argument('--repeat', type=int, default=200, help="1件 predict の計測回数（他の段階もこれを目安に調整）")
+    parser.add_argument('--reruns', type=int, default=9, help="app.py を再実行する回数")
+    parser.add_argument('--skip', nargs='*', default=[], help="計測しない段階（名前の前方一致）")
+    parser.add_argument('--save-baseline', action='store_true', help="今回の結果を基準値として保存する")
+    args = parser.parse_args(argv)
+
+    # satei_core は import 時に SATEI_MODEL を読むので、先に設定しておく（app.py も同じモデルを使う）
+    os.environ['SATEI_MODEL'] = os.path.abspath(args.model)
+    sys.path.insert(0, _HERE)
+
+    result = run_suite(args.model, args.repeat, args.reruns, tuple(args.skip))
+    _write_json(args.out, result)
+
+    if args.save_baseline:
+        _write_json(args.baseline, result)
+        report(result)
+        print(f"基準値を保存しました: {args.baseline}")
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    report(result, baseline)
+    print(f"結果を保存しました: {args.out}")
+    if baseline is None:
+        print("基準値がありません（--save-baseline で作成）")
+        return 0
+
+    regressions = compare(result, baseline, args.threshold, args.first_run_threshold)
+    for name, base, now, ratio in regressions:
+        print(f"悪化: {name} {_format_seconds(base)} -> {_format_seconds(now)} (x{ratio:.2f})", file=sys.stderr)
+    if regressions:
+        print(f"{len(regressions)} 段階が基準値より {args.threshold:.0%} を超えて遅くなりました", file=sys.stderr)
+        return 1
+    print(f"全段階が基準値の +{args.threshold:.0%} 以内です")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
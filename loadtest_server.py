@@ -0,0 +1,73 @@
+"""satei_server.py の負荷試験（ローカル用）。
+
+ランダムな区・町名・条件で並列にリクエストを送り、スループットと p50/p95/p99 レイテンシを表示します。
+
+使い方:
+    python satei_server.py --port 8600 &
+    python loadtest_server.py --url http://127.0.0.1:8600/predict --concurrency 32 --requests 5000
+"""
+import argparse
+import json
+import random
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from satei_data import town_data
+
+
+def random_unit(rng):
+    ku = rng.choice(list(town_data))
+    return {
+        "ku": ku,
+        "town": rng.choice(town_data[ku]),
+        "area": rng.randint(10, 300),
+        "walk": rng.randint(0, 30),
+        "year": rng.randint(1970, 2025),
+    }
+
+
+def _post(url, unit):
+    req = urllib.request.Request(url, data=json.dumps(unit).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req) as res:
+        res.read()
+    return time.perf_counter() - start
+
+
+def run(url, concurrency=32, requests=2000, seed=0):
+    rng = random.Random(seed)
+    units = [random_unit(rng) for _ in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = np.array(list(pool.map(lambda u: _post(url, u), units))) * 1000
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'rps': requests / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="査定 API の負荷試験")
+    parser.add_argument('--url', default='http://127.0.0.1:8600/predict')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    r = run(args.url, args.concurrency, args.requests, args.seed)
+    print(f"{r['requests']:,} 件 / 並列 {r['concurrency']} / {r['seconds']:.2f} 秒 ({r['rps']:,.0f} 件/秒)")
+    print(f"p50 {r['p50_ms']:.2f} ms / p95 {r['p95_ms']:.2f} ms / p99 {r['p99_ms']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""住所文字列から (区, 町名) を特定するリゾルバ。
+
+全ての区名・町名から Aho-Corasick オートマトンを import 時に1回だけ構築し、
+住所を1回走査するだけで候補を洗い出します。町名は最長一致（「西新宿」は「新宿」より優先）で、
+区名を含まない住所でも町名が1つの区にしか無ければ区を推定します。
+
+    resolve_location("東京都新宿区西新宿２丁目８－１")   # -> ('新宿区', '西新宿')
+    resolve_locations(["港区赤坂9-7-1", "自由が丘1丁目"])  # 大量の住所を一括で
+"""
+import re
+import unicodedata
+from collections import deque
+
+from satei_data import town_data
+
+# 表記ゆれ（ヶ/ケ/が・ノ/の・ツ/つ）は辞書側と入力側の両方を同じ文字に寄せる
+_VARIANTS = str.maketrans({'ケ': 'ヶ', 'が': 'ヶ', 'の': 'ノ', 'つ': 'ツ'})
+# 丁目・番地・号（算用数字・漢数字）とハイフン区切りの番地
+_CHOME_RE = re.compile(r'[0-9一二三四五六七八九十]+丁目|[0-9]+(?:[-‐－−][0-9]+)*(?:番地|番|号)?')
+
+
+def normalize(text):
+    """全角英数字を半角に、丁目・番地を除去し、表記ゆれを揃える。"""
+    text = unicodedata.normalize('NFKC', text)
+    text = re.sub(r'\s+', '', text)
+    if text.startswith('東京都'):
+        text = text[3:]
+    return _CHOME_RE.sub('', text).translate(_VARIANTS)
+
+
+class AddressResolver:
+    def __init__(self, towns_by_ku):
+        self.towns_by_ku = towns_by_ku
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]     # 状態ごとの一致パターン [(長さ, 種別, 名前), ...]
+        self._town_wards = {}
+
+        for ku, towns in towns_by_ku.items():
+            self._add(normalize(ku), ('ku', ku))
+            for town in towns:
+                key = normalize(town)
+                self._town_wards.setdefault(key, {}).setdefault(ku, town)
+        for key in self._town_wards:
+            self._add(key, ('town', key))
+        self._build_fail()
+
+    def _add(self, pattern, payload):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        if (len(pattern),) + payload not in self._out[state]:
+            self._out[state].append((len(pattern),) + payload)
+
+    def _build_fail(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _matches(self, text):
+        # (開始位置, 終了位置, 種別, 名前) を全て列挙する
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for length, kind, name in self._out[state]:
+                yield end - length, end, kind, name
+
+    def resolve(self, text):
+        """住所から (区, 町名) を返す。特定できない方は None。"""
+        text = normalize(text)
+        ku_hits, town_hits = [], []
+        for m in self._matches(text):
+            (ku_hits if m[2] == 'ku' else town_hits).append(m)
+
+        ku, span = None, (0, 0)
+        if ku_hits:
+            start, end, _, ku = min(ku_hits, key=lambda m: (m[0], m[0] - m[1]))
+            span = (start, end)
+
+        # 区名と重なる一致（「新宿区」の中の「新宿」など）は除き、長い順・前から順に採用する
+        candidates = sorted((m for m in town_hits if m[1] <= span[0] or m[0] >= span[1]),
+                            key=lambda m: (m[0] - m[1], m[0]))
+        for _, _, _, key in candidates:
+            wards = self._town_wards[key]
+            if ku is not None:
+                if ku in wards:
+                    return ku, wards[ku]
+            elif len(wards) == 1:
+                return next(iter(wards.items()))
+            else:
+                break    # 区名が無く、最長一致の町名が複数の区にある場合は特定しない
+        return ku, None
+
+    def resolve_many(self, texts):
+        return [self.resolve(text) for text in texts]
+
+
+_resolver = AddressResolver(town_data)
+
+
+def resolve_location(text):
+    return _resolver.resolve(text)
+
+
+def resolve_locations(texts):
+    return _resolver.resolve_many(texts)
@@ -0,0 +1,207 @@
+"""査定価格のメモ化キャッシュ（プロセス共通・LRU）。
+
+入力は (区, 町名, 面積, 徒歩, 築年) の離散値なので、同じ条件の再実行や
+同じ URL パラメータでの埋め込みは推論せずに結果を返せます。
+モデルファイルの内容（SHA-256）が変わったら自動でモデルを読み直し、キャッシュを破棄します。
+
+環境変数:
+    SATEI_CACHE_SIZE  キャッシュの最大件数（既定 10000）
+    SATEI_CACHE_WARM  起動時に先読みする条件の CSV（列: 区, 町名, 専有面積, 駅より徒歩, 築年月）
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from satei_core import MODEL_PATH, predict_price, make_address, load_model
+from satei_metrics import observe
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 10000
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _key(ku, town, area, walk, year):
+    return (ku, town, int(area), int(walk), int(year))
+
+
+class ModelWatcher:
+    """モデルファイルを監視し、内容（SHA-256）が変わったら読み直す。
+
+    get() は呼び出し時点のモデルを返すだけなので、読み直しの最中や後でも、
+    既に get() したモデルで処理中のリクエストはそのまま古いモデルで完了する。
+    """
+
+    def __init__(self, path=MODEL_PATH, loader=load_model, on_reload=None):
+        self.path = path
+        self.model = None
+        self.model_hash = None
+        self.reloads = 0
+        self.last_reload_seconds = None
+        self._loader = loader
+        self._on_reload = on_reload
+        self._lock = threading.Lock()
+        self._stat = None
+        self.get()
+
+    def get(self):
+        # stat が変わったときだけハッシュを計算し直す（通常は os.stat 1回で済む）
+        # 差し替え途中でファイルが無い・壊れている間は、読み込み済みのモデルをそのまま使い続ける
+        try:
+            st = os.stat(self.path)
+        except OSError as e:
+            if self.model is None:
+                raise
+            logger.warning("モデルファイルを確認できません（現在のモデルを継続）: %s", e)
+            return self.model
+        stat = (st.st_mtime_ns, st.st_size)
+        if stat == self._stat:
+            return self.model
+        with self._lock:
+            if stat == self._stat:
+                return self.model
+            try:
+                digest = file_hash(self.path)
+                if digest != self.model_hash:
+                    start = time.perf_counter()
+                    model = self._loader(self.path)
+                    self.model, self.model_hash = model, digest
+                    self.last_reload_seconds = time.perf_counter() - start
+                    self.reloads += 1
+                    observe('model_load', self.last_reload_seconds)
+                    if self._on_reload is not None:
+                        self._on_reload()
+            except Exception as e:
+                if self.model is None:
+                    raise
+                # 同じ状態のファイルで読み込みを繰り返さないよう stat は記録し、次に更新されたら再試行する
+                logger.warning("モデルの読み込みに失敗しました（現在のモデルを継続）: %s: %s", self.path, e)
+            self._stat = stat
+            return self.model
+
+
+class PredictionCache:
+    """model.predict の前段に置く LRU キャッシュ。predict() は査定価格（万円）を返す。"""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, model_path=MODEL_PATH, loader=load_model):
+        self.maxsize = maxsize
+        self.model_path = model_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._watcher = ModelWatcher(model_path, loader, on_reload=self._drop_entries)
+
+    def _drop_entries(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def model(self):
+        return self._watcher.model
+
+    @property
+    def model_hash(self):
+        return self._watcher.model_hash
+
+    def get_model(self):
+        """モデルファイルの更新を確認したうえで、現在のモデルを返す。"""
+        return self._watcher.get()
+
+    def _get(self, key):
+        with self._lock:
+            price = self._entries.get(key)
+            if price is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return price
+
+    def _put(self, key, price, model):
+        with self._lock:
+            # 推論中にモデルが差し替わっていたら古い結果は残さない。差し替え後の _drop_entries も
+            # このロックを取るので、確認と追加の間に差し替え・破棄が割り込むことはない
+            if model is not self.model:
+                return False
+            self._entries[key] = price
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return True
+
+    def predict(self, ku, town, area, walk, year):
+        model = self.get_model()
+        key = _key(ku, town, area, walk, year)
+        price = self._get(key)
+        if price is None:
+            # キーと同じ（整数に丸めた）値で推論する。60.9 の結果が 60 の結果として残らないように
+            ku, town, area, walk, year = key
+            price = float(predict_price(model, ku, make_address(ku, town), area, walk, year)[0])
+            self._put(key, price, model)
+        return price
+
+    def warm(self, units):
+        """(区, 町名, 面積, 徒歩, 築年) の組をまとめて1回の predict で先読みする。先読みした件数を返す。"""
+        model = self.get_model()
+        with self._lock:
+            keys = list(dict.fromkeys(k for k in (_key(*u) for u in units) if k not in self._entries))
+        keys = keys[len(keys) - self.maxsize:] if self.maxsize > 0 else []    # keys[-0:] は全件になる
+        if not keys:
+            return 0
+        ku, town, area, walk, year = (np.array(col) for col in zip(*keys))
+        prices = predict_price(model, ku, make_address(ku, town), area, walk, year, stage_prefix='warm_')
+        return sum(self._put(key, float(price), model) for key, price in zip(keys, prices))
+
+    def warm_from_csv(self, path):
+        import pandas as pd
+        df = pd.read_csv(path)
+        return self.warm(zip(df['区'], df['町名'], df['専有面積'], df['駅より徒歩'], df['築年月']))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'model_hash': self.model_hash,
+                'model_reloads': self._watcher.reloads,
+                'last_reload_seconds': self._watcher.last_reload_seconds,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """プロセス共通のキャッシュを返す（初回呼び出し時に作成・先読み）。"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PredictionCache(int(os.environ.get('SATEI_CACHE_SIZE', DEFAULT_CACHE_SIZE)))
+            warm_path = os.environ.get('SATEI_CACHE_WARM')
+            if warm_path:
+                _cache.warm_from_csv(warm_path)
+        return _cache
@@ -0,0 +1,108 @@
+# --- 23区マンション査定：共通ロジック ---
+# 特徴量の組み立て・利回り計算・モデル読み込みを app.py から切り出したものです。
+# 入力はスカラーでも配列でも受け付け、配列の場合は1回の predict でまとめて処理できます。
+# 起動を速くするため、pandas / lightgbm は実際に必要になるまで import しません。
+import os
+
+import numpy as np
+
+from satei_data import rent_factor
+from satei_metrics import stage
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+LGB_MODEL_PATH = os.path.join(_HERE, 'satei_model.txt')      # LightGBM ネイティブ形式（正本）
+PICKLE_MODEL_PATH = os.path.join(_HERE, 'satei_model.pkl')   # 旧形式（互換用）
+MODEL_PATH = os.environ.get('SATEI_MODEL', LGB_MODEL_PATH)
+FEATURE_COLUMNS = ['区', '所在', '専有面積', '駅より徒歩', '築年月']
+
+BASE_YEAR = 2025        # 築年数の基準年
+BASE_M2_RENT = 3300     # 基準賃料（円/㎡・月）
+RANGE_FACTOR = 1.25     # ブランド期待価格レンジの上限倍率
+
+# app.py の入力フォームと同じ入力範囲（両端を含む）
+INPUT_RANGES = {'area': (10, 300), 'walk': (0, 30), 'year': (1970, BASE_YEAR)}
+
+
+def load_model(path=MODEL_PATH):
+    """拡張子でモデル形式を判別して読み込む。
+
+    .txt  LightGBM のネイティブ形式（lightgbm.Booster）
+    .npz  satei_fast.py で配列化したもの（ArrayPredictor。lightgbm / pandas 不要）
+    .pkl  旧来の pickle（lightgbm / scikit-learn のバージョン差に弱いので互換用）
+    .ref  satei_shared.py のモデルストア（current.ref が指す版をメモリマップ）
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.ref':
+        from satei_shared import load_ref
+        return load_ref(path)
+    if ext == '.npz':
+        from satei_fast import ArrayPredictor
+        return ArrayPredictor.load(path)
+    if ext == '.pkl':
+        import pickle
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    import lightgbm as lgb
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    # 書き込み途中のファイルを LightGBM に渡すとプロセスごと異常終了することがあるので、先に末尾まであるか確認する
+    if '\nend of trees\n' not in text or not text.rstrip('\n').split('\n')[-1].startswith('pandas_categorical:'):
+        raise ValueError(f"モデルファイルが不完全です: {path}")
+    return lgb.Booster(model_str=text)
+
+
+def predict_price(model, ku, address, area, walk, year, stage_prefix=''):
+    """モデルの種類（Booster / ArrayPredictor）によらず査定価格（万円）の配列を返す。
+
+    stage_prefix は計測（satei_metrics）の段階名の接頭辞。感度分析のような多行の推論を
+    1件の査定の build_input / predict と混ぜないために使う。
+    """
+    with stage(stage_prefix + 'build_input'):
+        if hasattr(model, 'encode'):
+            X = model.encode(ku, address, area, walk, year)
+        else:
+            X = build_input_df(ku, address, area, walk, year)
+    with stage(stage_prefix + 'predict'):
+        return model.predict(X)
+
+
+def _as_column(value, n):
+    # スカラーは n 行に広げ、配列（Series 含む）はインデックスを無視して値だけ使う
+    return np.broadcast_to(np.asarray(value, dtype=object if isinstance(value, str) else None), (n,))
+
+
+def make_address(ku, loc):
+    """区と町名から「東京都〇〇区〇〇」形式の所在を作る（配列可）。"""
+    if isinstance(ku, str) and isinstance(loc, str):
+        return f"東京都{ku}{loc}"
+    return '東京都' + np.asarray(ku, dtype=object) + np.asarray(loc, dtype=object)
+
+
+def build_input_df(ku, address, area, walk, year):
+    """推論用 DataFrame を組み立てる。全てスカラーなら1行、配列なら配列長の行数になる。"""
+    import pandas as pd
+    values = (ku, address, area, walk, year)
+    n = np.broadcast(*(np.asarray(v, dtype=object) for v in values)).size
+    input_df = pd.DataFrame({col: _as_column(v, n) for col, v in zip(FEATURE_COLUMNS, values)})
+    input_df['区'] = input_df['区'].astype('category')
+    input_df['所在'] = input_df['所在'].astype('category')
+    for col in FEATURE_COLUMNS[2:]:
+        input_df[col] = pd.to_numeric(input_df[col])
+    return input_df
+
+
+def calc_yield(ku, area, year, price):
+    """区の賃料係数と築年の減価から予想利回り（%）を計算する（配列可）。"""
+    if isinstance(ku, str):
+        f = rent_factor.get(ku, 1.0)
+    else:
+        names, inverse = np.unique(np.asarray(ku, dtype=object), return_inverse=True)
+        f = np.array([rent_factor.get(k, 1.0) for k in names], dtype=float)[inverse]
+    age_effect = np.maximum(0.65, 1.0 - (np.maximum(0, BASE_YEAR - np.asarray(year)) * 0.008))
+    m2_rent = BASE_M2_RENT * f * age_effect
+    annual_rent_man = (m2_rent * np.asarray(area) * 12) / 10000
+    return (annual_rent_man / np.asarray(price)) * 100
+
+
+def calc_range_max(price):
+    return np.asarray(price) * RANGE_FACTOR
@@ -0,0 +1,262 @@
+"""satei_model.txt の決定木を NumPy 配列に書き出し、pandas を使わずに推論する高速版。
+
+LightGBM の pandas カテゴリ変換や DataFrame 構築を省き、全ての木を配列上で同時に辿ります。
+区・所在のカテゴリは学習時の語彙（pandas_categorical）から整数コードを事前計算しておきます。
+
+使い方:
+    python satei_fast.py compile            # satei_model.txt -> satei_model.npz
+    python satei_fast.py bench              # model.predict との一致確認と速度比較
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from satei_core import LGB_MODEL_PATH, FEATURE_COLUMNS
+from satei_data import town_data
+
+COMPILED_PATH = os.path.splitext(LGB_MODEL_PATH)[0] + '.npz'
+
+# LightGBM の missing_type
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+_MISSING_TYPES = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+_ZERO_THRESHOLD = 1e-35
+
+
+def compile_booster(booster):
+    """Booster の全ての木のノードを1本の配列に平坦化する。"""
+    dump = booster.dump_model()
+    feature, threshold, cat_index, default_left, missing_type = [], [], [], [], []
+    left, right, value, roots, cat_sets = [], [], [], [], []
+
+    def add(node):
+        idx = len(feature)
+        for arr in (feature, threshold, cat_index, default_left, missing_type, left, right, value):
+            arr.append(0)
+        if 'split_index' not in node:
+            feature[idx], cat_index[idx] = -1, -1
+            left[idx] = right[idx] = idx
+            value[idx] = node['leaf_value']
+            return idx
+
+        feature[idx] = node['split_feature']
+        default_left[idx] = node['default_left']
+        missing_type[idx] = _MISSING_TYPES[node['missing_type']]
+        if node['decision_type'] == '==':
+            cat_index[idx] = len(cat_sets)
+            cat_sets.append([int(c) for c in str(node['threshold']).split('||')])
+        else:
+            cat_index[idx] = -1
+            threshold[idx] = node['threshold']
+        left[idx] = add(node['left_child'])
+        right[idx] = add(node['right_child'])
+        return idx
+
+    for tree in dump['tree_info']:
+        roots.append(add(tree['tree_structure']))
+
+    # カテゴリ分岐は LightGBM と同じく uint32 のビットセットで持つ
+    n_words = max((max(s) // 32 + 1 for s in cat_sets), default=1)
+    cat_bits = np.zeros((max(len(cat_sets), 1), n_words), dtype=np.uint32)
+    for i, cats in enumerate(cat_sets):
+        for c in cats:
+            cat_bits[i, c >> 5] |= np.uint32(1 << (c & 31))
+
+    ku_vocab, address_vocab = booster.pandas_categorical
+    return {
+        'feature': np.array(feature, dtype=np.int32),
+        'threshold': np.array(threshold, dtype=np.float64),
+        'cat_index': np.array(cat_index, dtype=np.int32),
+        'default_left': np.array(default_left, dtype=bool),
+        'missing_type': np.array(missing_type, dtype=np.int8),
+        'left': np.array(left, dtype=np.int32),
+        'right': np.array(right, dtype=np.int32),
+        'value': np.array(value, dtype=np.float64),
+        'roots': np.array(roots, dtype=np.int32),
+        'cat_bits': cat_bits,
+        'ku_vocab': np.array(ku_vocab, dtype=str),
+        'address_vocab': np.array(address_vocab, dtype=str),
+    }
+
+
+def expand_arrays(arrays):
+    """compile_booster() の配列から、推論時に使う派生配列（nan_left・cat_table）を作る。"""
+    missing_type = np.asarray(arrays['missing_type'])
+    threshold = np.asarray(arrays['threshold'])
+
+    # NaN が来たときの数値分岐の行き先（missing_type が NaN / Zero なら default_left、None なら 0 として比較）
+    nan_left = np.where(missing_type == MISSING_NONE, 0.0 <= threshold, np.asarray(arrays['default_left']))
+
+    # ビットセットを [分岐番号 + 1, コード + 1] の真偽表に展開（0 行目・0 列目・最終列は常に右）
+    bits = np.unpackbits(np.asarray(arrays['cat_bits']).view(np.uint8), axis=1, bitorder='little').astype(bool)
+    cat_table = np.zeros((bits.shape[0] + 1, bits.shape[1] + 2), dtype=bool)
+    cat_table[1:, 1:-1] = bits
+    return {'nan_left': nan_left, 'cat_table': cat_table}
+
+
+def compile_model(src=LGB_MODEL_PATH, dst=COMPILED_PATH):
+    from satei_core import load_model
+    arrays = compile_booster(load_model(src))
+    np.savez(dst, **arrays)
+    return dst
+
+
+class ArrayPredictor:
+    """compile_booster() の配列だけで推論する。model.predict と同じ値を返す。"""
+
+    def __init__(self, arrays):
+        for name in ('feature', 'threshold', 'cat_index', 'default_left', 'missing_type',
+                     'left', 'right', 'value', 'roots', 'cat_bits'):
+            setattr(self, name, np.asarray(arrays[name]))
+
+        # 推論用の派生配列（共有メモリ版では書き出し済みのものをそのままマップして使う）
+        derived = arrays if 'cat_table' in arrays else expand_arrays(arrays)
+        self.nan_left = np.asarray(derived['nan_left'])
+        self.cat_table = np.asarray(derived['cat_table'])
+        self.has_zero_missing = bool((self.missing_type[self.feature >= 0] == MISSING_ZERO).any())
+
+        # 区・所在 -> 学習時のカテゴリコード（未知の値は NaN = LightGBM と同じ扱い）
+        self.ku_codes = {k: float(i) for i, k in enumerate(arrays['ku_vocab'].tolist())}
+        self.address_codes = {a: float(i) for i, a in enumerate(arrays['address_vocab'].tolist())}
+        self.town_codes = {
+            (ku, town): (self.ku_codes.get(ku, np.nan), self.address_codes.get(f"東京都{ku}{town}", np.nan))
+            for ku, towns in town_data.items() for town in towns
+        }
+
+    @classmethod
+    def from_booster(cls, booster):
+        return cls(compile_booster(booster))
+
+    @classmethod
+    def load(cls, path=COMPILED_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({k: data[k] for k in data.files})
+
+    def encode(self, ku, address, area, walk, year):
+        """build_input_df と同じ列順の float 行列（カテゴリは整数コード）を作る。"""
+        ku = np.atleast_1d(np.asarray(ku, dtype=object))
+        address = np.atleast_1d(np.asarray(address, dtype=object))
+        n = np.broadcast(ku, address, np.asarray(area), np.asarray(walk), np.asarray(year)).size
+        X = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float64)
+        X[:, 0] = [self.ku_codes.get(k, np.nan) for k in np.broadcast_to(ku, (n,))]
+        X[:, 1] = [self.address_codes.get(a, np.nan) for a in np.broadcast_to(address, (n,))]
+        X[:, 2] = area
+        X[:, 3] = walk
+        X[:, 4] = year
+        return X
+
+    def encode_units(self, ku, town, area, walk, year):
+        """区・町名の組み合わせは事前計算したコード表から引く。"""
+        ku = np.atleast_1d(np.asarray(ku, dtype=object))
+        town = np.atleast_1d(np.asarray(town, dtype=object))
+        n = np.broadcast(ku, town, np.asarray(area), np.asarray(walk), np.asarray(year)).size
+        X = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float64)
+        X[:, :2] = np.array([self.town_codes.get(key, (self.ku_codes.get(key[0], np.nan), np.nan))
+                             for key in zip(np.broadcast_to(ku, (n,)), np.broadcast_to(town, (n,)))]).reshape(n, 2)
+        X[:, 2] = area
+        X[:, 3] = walk
+        X[:, 4] = year
+        return X
+
+    def _go_left(self, node, fval):
+        isnan = np.isnan(fval)
+
+        # 数値分岐（LightGBM の NumericalDecision と同じ規則）
+        num_left = fval <= self.threshold[node]
+        if self.has_zero_missing:
+            is_zero = (np.abs(fval) <= _ZERO_THRESHOLD) & (self.missing_type[node] == MISSING_ZERO)
+            num_left = np.where(is_zero, self.default_left[node], num_left)
+        num_left = np.where(isnan, self.nan_left[node], num_left)
+
+        # カテゴリ分岐（CategoricalDecision と同じ規則：NaN・負の値・未知のコードは右）
+        code = np.where(isnan, -1, fval).astype(np.intp) + 1
+        np.clip(code, 0, self.cat_table.shape[1] - 1, out=code)
+        cidx = self.cat_index[node]
+        return np.where(cidx >= 0, self.cat_table[cidx + 1, code], num_left)
+
+    def predict(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        n_rows, n_trees = len(X), len(self.roots)
+
+        # 行 × 木 を1本の配列に並べ、まだ葉に着いていない要素だけを1段ずつ進める
+        node = np.tile(self.roots, n_rows)
+        offset = np.repeat(np.arange(n_rows) * X.shape[1], n_trees)
+        flat_X = X.ravel()
+        active = np.arange(node.size)
+        while active.size:    # 0 行なら最初から何もしない
+            cur = node[active]
+            feat = self.feature[cur]
+            internal = feat >= 0
+            if not internal.all():
+                active, cur, feat = active[internal], cur[internal], feat[internal]
+                if not active.size:
+                    break
+            go_left = self._go_left(cur, flat_X[offset[active] + feat])
+            node[active] = np.where(go_left, self.left[cur], self.right[cur])
+
+        return self.value[node].reshape(n_rows, n_trees).sum(axis=1)
+
+    def predict_units(self, ku, town, area, walk, year):
+        return self.predict(self.encode_units(ku, town, area, walk, year))
+
+
+def _test_grid():
+    ku, town, area, walk, year = [], [], [], [], []
+    for k, towns in town_data.items():
+        for i, t in enumerate(towns):
+            for a, w, y in ((25, 1, 1975), (60, 5, 2015), (85, 12, 2000), (150, 25, 2025), (300, 30, 1990 + i % 30)):
+                ku.append(k), town.append(t), area.append(a), walk.append(w), year.append(y)
+    return ku, town, area, walk, year
+
+
+def bench(rounds=200, tol=1e-6):
+    from satei_core import load_model, build_input_df, make_address
+
+    model = load_model(LGB_MODEL_PATH)
+    fast = ArrayPredictor.from_booster(model)
+
+    ku, town, area, walk, year = (np.array(v) for v in _test_grid())
+    expected = model.predict(build_input_df(ku, make_address(ku, town), area, walk, year))
+    actual = fast.predict_units(ku, town, area, walk, year)
+    diff = float(np.max(np.abs(expected - actual)))
+    print(f"一致確認: {len(ku):,} 件 / 最大誤差 {diff:.3g}")
+    if diff > tol:
+        raise SystemExit(f"model.predict と一致しません（許容誤差 {tol}）")
+    empty = fast.predict_units(*(v[:0] for v in (ku, town, area, walk, year)))
+    if empty.shape != (0,):
+        raise SystemExit(f"0 件の入力に対する結果の形が不正です: {empty.shape}")
+
+    def timeit(fn, n):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - start) / n
+
+    # 少量ではこちらが速く、数千件以上では LightGBM 本体（C++）が速い
+    for size in (1, 32, 256, len(ku)):
+        sl = (ku[:size], town[:size], area[:size], walk[:size], year[:size])
+        n = rounds if size <= 32 else 5
+        t_lgb = timeit(lambda: model.predict(build_input_df(sl[0], make_address(sl[0], sl[1]), *sl[2:])), n)
+        t_fast = timeit(lambda: fast.predict_units(*sl), n)
+        print(f"{size:>6,} 件: LightGBM {t_lgb * 1e3:8.3f} ms / NumPy {t_fast * 1e3:8.3f} ms ({t_lgb / t_fast:.1f} 倍)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="決定木の配列化と NumPy 推論")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('compile', help="satei_model.txt を .npz に書き出す")
+    p.add_argument('--src', default=LGB_MODEL_PATH)
+    p.add_argument('--dst', default=COMPILED_PATH)
+    sub.add_parser('bench', help="model.predict との一致確認と速度比較")
+    args = parser.parse_args(argv)
+
+    if args.command == 'compile':
+        dst = compile_model(args.src, args.dst)
+        print(f"書き出しました: {dst} ({os.path.getsize(dst) / 1024:.0f} KB)")
+    else:
+        bench()
+
+
+if __name__ == '__main__':
+    main()
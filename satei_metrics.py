@@ -0,0 +1,136 @@
+"""査定処理の段階別レイテンシ計測（オプトイン）。
+
+環境変数 SATEI_METRICS=1 のときだけ計測します。無効時の stage() は何もしない
+コンテキストマネージャを返すだけなので、ホットパスに置いても負荷はほぼありません。
+
+段階ごとに直近 SATEI_METRICS_WINDOW 件（既定 1024）の所要時間を保持して p50/p95/p99 を出し、
+区ごとの査定件数も数えます。結果は flush() で JSON と Prometheus テキスト形式のファイルに
+書き出します（satei_server.py では GET /metrics でも取得可能）。
+
+環境変数:
+    SATEI_METRICS           1 で有効化
+    SATEI_METRICS_FILE      書き出し先の JSON（既定 metrics.json。同名の .prom も出力）
+    SATEI_METRICS_WINDOW    段階ごとに保持するサンプル数
+    SATEI_METRICS_INTERVAL  flush() で実際に書き出す最短間隔（秒、既定 1）
+"""
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+ENABLED = os.environ.get('SATEI_METRICS') == '1'
+METRICS_FILE = os.environ.get('SATEI_METRICS_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics.json'))
+WINDOW = int(os.environ.get('SATEI_METRICS_WINDOW', 1024))
+FLUSH_INTERVAL = float(os.environ.get('SATEI_METRICS_INTERVAL', 1.0))
+QUANTILES = (0.5, 0.95, 0.99)
+
+logger = logging.getLogger(__name__)
+
+_NULL = contextlib.nullcontext()
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=WINDOW))
+_counts = Counter()
+_wards = Counter()
+_last_flush = 0.0
+
+
+def observe(name, seconds):
+    if not ENABLED:
+        return
+    with _lock:
+        _samples[name].append(seconds)
+        _counts[name] += 1
+
+
+@contextlib.contextmanager
+def _timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def stage(name):
+    """with stage('predict'): ... の形で段階の所要時間を記録する。"""
+    return _timed(name) if ENABLED else _NULL
+
+
+def count_ward(ward):
+    if ENABLED:
+        with _lock:
+            _wards[ward] += 1
+
+
+def _quantile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def snapshot():
+    """段階ごとの {count, p50, p95, p99, mean}（秒）と区ごとの件数を返す。"""
+    with _lock:
+        samples = {name: sorted(values) for name, values in _samples.items()}
+        counts = dict(_counts)
+        wards = dict(_wards)
+    stages = {}
+    for name, values in samples.items():
+        if not values:
+            continue
+        stat = {'count': counts[name], 'mean': sum(values) / len(values)}
+        for q in QUANTILES:
+            stat[f'p{int(q * 100)}'] = _quantile(values, q)
+        stages[name] = stat
+    return {'time': time.time(), 'window': WINDOW, 'stages': stages, 'wards': wards}
+
+
+def prometheus_text(snap=None):
+    snap = snap or snapshot()
+    lines = ['# TYPE satei_stage_seconds summary']
+    for name, stat in sorted(snap['stages'].items()):
+        for q in QUANTILES:
+            lines.append(f'satei_stage_seconds{{stage="{name}",quantile="{q}"}} {stat[f"p{int(q * 100)}"]:.6f}')
+        lines.append(f'satei_stage_seconds_count{{stage="{name}"}} {stat["count"]}')
+    lines.append('# TYPE satei_valuations_total counter')
+    for ward, n in sorted(snap['wards'].items()):
+        lines.append(f'satei_valuations_total{{ward="{ward}"}} {n}')
+    return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path, text):
+    # 別プロセス（複数レプリカ）と同時に書いても衝突しないよう、一時ファイル名は毎回一意にする
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        os.fchmod(fd, 0o644)    # mkstemp は 0600 で作るので、通常の open() と同じく他ユーザーからも読めるようにする
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def flush(path=METRICS_FILE, force=False):
+    """JSON（path）と Prometheus テキスト（拡張子 .prom）を書き出す。間隔が短すぎる呼び出しは無視する。
+
+    書き出しに失敗しても例外は出さない（計測のせいで査定を失敗させない）。
+    """
+    global _last_flush
+    if not ENABLED:
+        return
+    with _flush_lock:
+        now = time.monotonic()
+        if not force and now - _last_flush < FLUSH_INTERVAL:
+            return
+        _last_flush = now
+        snap = snapshot()
+        try:
+            _write_atomic(path, json.dumps(snap, ensure_ascii=False, indent=1))
+            _write_atomic(os.path.splitext(path)[0] + '.prom', prometheus_text(snap))
+        except OSError as e:
+            logger.warning("計測結果を書き出せませんでした: %s", e)
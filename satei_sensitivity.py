@@ -0,0 +1,74 @@
+"""What-if 感度分析：面積・徒歩・築年を動かしたときの価格と利回りのカーブ。
+
+1つの物件を基準に、1変数（例：築年 1970〜2025 の全56点）または2変数（例：面積 × 徒歩）の
+全組み合わせを1つの DataFrame にまとめ、1回の predict で推論します。
+結果は基準物件ごとにキャッシュし、モデルが更新されたら（satei_cache のハッシュが変われば）作り直します。
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from satei_core import INPUT_RANGES, predict_price, make_address, calc_yield
+from satei_cache import get_prediction_cache
+
+VARIABLES = ('area', 'walk', 'year')
+DEFAULT_CURVE_CACHE_SIZE = 256
+
+_curves = OrderedDict()
+_curves_lock = threading.Lock()
+
+
+def sweep_values(name):
+    lo, hi = INPUT_RANGES[name]
+    return np.arange(lo, hi + 1)
+
+
+def _predict_sweep(model, ku, town, base, names, values):
+    # names の各変数を values の全組み合わせで動かし、残りは基準値のまま1回で推論する
+    grids = np.meshgrid(*values, indexing='ij')
+    cols = dict(base)
+    for name, grid in zip(names, grids):
+        cols[name] = grid.ravel()
+    n = grids[0].size
+    price = predict_price(model, ku, make_address(ku, town), cols['area'], cols['walk'], cols['year'],
+                          stage_prefix='sensitivity_')
+    yield_rate = calc_yield(ku, np.broadcast_to(cols['area'], (n,)), np.broadcast_to(cols['year'], (n,)), price)
+    return price.reshape(grids[0].shape), yield_rate.reshape(grids[0].shape)
+
+
+def sensitivity(ku, town, area, walk, year, vary=('year',), values=None):
+    """vary に指定した1〜2変数を動かしたときの価格・利回りを返す。
+
+    戻り値は {'axes': {変数名: 値の配列}, 'price': 配列, 'yield': 配列}（2変数なら2次元）。
+    values を省略した変数は app.py の入力範囲を1刻みで全て動かす。
+    """
+    if isinstance(vary, str):
+        vary = (vary,)
+    vary = tuple(vary)
+    if not 1 <= len(vary) <= 2 or any(name not in VARIABLES for name in vary):
+        raise ValueError(f"vary には {VARIABLES} から1〜2個を指定してください: {vary}")
+    values = tuple(np.array(values[i]) if values is not None else sweep_values(name)
+                   for i, name in enumerate(vary))
+
+    cache = get_prediction_cache()
+    model = cache.get_model()
+    key = (cache.model_hash, ku, town, int(area), int(walk), int(year), vary,
+           tuple(v.tobytes() for v in values))
+    with _curves_lock:
+        result = _curves.get(key)
+        if result is not None:
+            _curves.move_to_end(key)
+            return result
+
+    base = {'area': int(area), 'walk': int(walk), 'year': int(year)}
+    price, yield_rate = _predict_sweep(model, ku, town, base, vary, values)
+    for arr in (price, yield_rate, *values):
+        arr.setflags(write=False)
+    result = {'axes': dict(zip(vary, values)), 'price': price, 'yield': yield_rate}
+
+    with _curves_lock:
+        _curves[key] = result
+        while len(_curves) > DEFAULT_CURVE_CACHE_SIZE:
+            _curves.popitem(last=False)
+    return result
@@ -0,0 +1,260 @@
+"""Streamlit を経由しない JSON 査定 API サーバー。
+
+親画面（1111.html）などから直接 HTTP で呼び出し、{price, yield, range_max} を受け取れます。
+同時に届いたリクエストは短い時間窓（既定 5ms）の間に集めて1回の predict にまとめます。
+
+使い方:
+    python satei_server.py --port 8600
+    curl -X POST localhost:8600/predict \\
+         -d '{"ku": "新宿区", "town": "西新宿", "area": 60, "walk": 5, "year": 2015}'
+    SATEI_METRICS=1 python satei_server.py      # GET /metrics で段階別レイテンシを取得
+"""
+import argparse
+import json
+import math
+import queue
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from satei_core import BASE_YEAR, INPUT_RANGES, MODEL_PATH, predict_price, make_address, calc_yield, calc_range_max
+from satei_cache import ModelWatcher
+from satei_data import town_data
+from satei_address import resolve_location
+from satei_metrics import stage, count_ward, prometheus_text
+
+DEFAULT_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH = 256
+
+
+class _Pending:
+    __slots__ = ('unit', 'result', 'error', 'done')
+
+    def __init__(self, unit):
+        self.unit = unit
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """submit() された査定を時間窓ごとにまとめ、専用スレッドで1回の predict にかける。"""
+
+    def __init__(self, get_model, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+        self.get_model = get_model    # バッチごとに呼び、その時点のモデルで推論する（ホットリロード対応）
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='satei-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, ku, town, area, walk, year):
+        pending = _Pending((ku, town, area, walk, year))
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._predict(batch)
+
+    def _predict(self, batch):
+        try:
+            ku, town, area, walk, year = (np.array(col) for col in zip(*(p.unit for p in batch)))
+            with stage('server_batch'):
+                price = predict_price(self.get_model(), ku, make_address(ku, town), area, walk, year)
+            with stage('yield'):
+                yield_rate = calc_yield(ku, area, year, price)
+                range_max = calc_range_max(price)
+            for i, pending in enumerate(batch):
+                pending.result = {
+                    "price": int(round(price[i])),
+                    "yield": round(float(yield_rate[i]), 2),
+                    "range_max": int(round(range_max[i])),
+                }
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+        finally:
+            self.batches += 1
+            self.items += len(batch)
+            for pending in batch:
+                pending.done.set()
+
+
+def _to_int(value, label):
+    # "60" や 60.0 も受け付ける。inf / nan は int() できないので先に弾く
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{label}が不正です: {value}")
+    return int(number)
+
+
+def parse_unit(payload):
+    """リクエスト JSON を (区, 町名, 面積, 徒歩, 築年) に変換する。不正な値は ValueError。
+
+    区・町名は ku / town で指定するか、住所文字列 location から解決する。
+    """
+    ku = payload.get('ku')
+    town = payload.get('town')
+    if ku is None and 'location' in payload:
+        ku, town = resolve_location(str(payload['location']))
+    if ku not in town_data:
+        raise ValueError(f"区が不正です: {ku}")
+    if town not in town_data[ku]:
+        raise ValueError(f"町名が不正です: {town}")
+
+    area = _to_int(payload.get('area', 60), "専有面積")
+    walk = _to_int(payload.get('walk', 5), "駅より徒歩")
+    if 'year' in payload:
+        year = _to_int(payload['year'], "築年月")
+    else:
+        year = BASE_YEAR - _to_int(payload.get('age', 10), "築年数")
+
+    # app.py の入力フォームと同じ範囲に揃える
+    for name, label, unit, value in (('area', "専有面積", "㎡", area), ('walk', "駅より徒歩", "分", walk),
+                                     ('year', "築年月", "年", year)):
+        lo, hi = INPUT_RANGES[name]
+        if not lo <= value <= hi:
+            raise ValueError(f"{label}は {lo}〜{hi} {unit}で指定してください")
+    return ku, town, area, walk, year
+
+
+class SateiHandler(BaseHTTPRequestHandler):
+    batcher = None
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {"status": "ok", "batches": self.batcher.batches, "items": self.batcher.items})
+        elif self.path == '/metrics':
+            # SATEI_METRICS=1 で起動したときの段階別レイテンシ（Prometheus テキスト形式）
+            body = prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:    # rfile.read(-1) は接続が閉じるまで待ってしまう
+                raise ValueError(f"Content-Length が不正です: {length}")
+            unit = parse_unit(json.loads(self.rfile.read(length) or b'{}'))
+        except (ValueError, TypeError, AttributeError, OverflowError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        count_ward(unit[0])
+        try:
+            with stage('server_request'):
+                result = self.batcher.submit(*unit)
+            self._send_json(200, result)
+        except Exception as e:
+            self._send_json(500, {"error": f"エラーが発生しました: {e}"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SateiHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128   # 既定の 5 では同時接続が多いと接続リセットになる
+    reuse_port = False
+
+    def server_bind(self):
+        # 複数のワーカープロセスで同じポートを待ち受ける（Linux の SO_REUSEPORT）
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+def make_server(host='127.0.0.1', port=8600, model=None, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH,
+                model_path=MODEL_PATH, reuse_port=False):
+    """model を渡さなければ model_path を監視し、ファイルが更新されたら次のバッチから新しいモデルを使う。"""
+    get_model = (lambda: model) if model is not None else ModelWatcher(model_path).get
+    handler = type('Handler', (SateiHandler,), {'batcher': MicroBatcher(get_model, window_ms, max_batch)})
+    server_class = type('Server', (SateiHTTPServer,), {'reuse_port': reuse_port})
+    return server_class((host, port), handler)
+
+
+def _serve(server):
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _worker_main(host, port, model_path, window_ms, max_batch):
+    _serve(make_server(host, port, None, window_ms, max_batch, model_path, reuse_port=True))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON 査定 API サーバー")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--window-ms', type=float, default=DEFAULT_WINDOW_MS, help="リクエストを集める時間窓（ミリ秒）")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help="1回の predict の最大件数")
+    parser.add_argument('--model', default=MODEL_PATH, help="モデルファイルのパス（model_store/current.ref で共有モデル）")
+    parser.add_argument('--workers', type=int, default=1, help="ワーカープロセス数（2以上は Linux のみ）")
+    args = parser.parse_args(argv)
+
+    print(f"査定 API を起動しました: http://{args.host}:{args.port}/predict（{args.workers} プロセス）")
+    if args.workers <= 1:
+        _serve(make_server(args.host, args.port, None, args.window_ms, args.max_batch, args.model))
+        return
+
+    import multiprocessing as mp
+    procs = [mp.Process(target=_worker_main, args=(args.host, args.port, args.model, args.window_ms, args.max_batch))
+             for _ in range(args.workers)]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.join()
+
+
+if __name__ == '__main__':
+    main()
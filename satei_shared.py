@@ -0,0 +1,200 @@
+"""複数のワーカープロセスで1つのモデルを共有するモデルストア（ホットリロード対応）。
+
+モデルを satei_fast.py の配列形式に変換して model_store/versions/<版>/ に .npy で書き出し、
+各プロセスは読み取り専用でメモリマップします。物理メモリ上のモデルはページキャッシュの1つだけです。
+どの版を使うかは model_store/current.ref（版名だけのテキスト）で指し、新しい版は
+ディレクトリを書き終えてから current.ref を os.replace で差し替えるので、切り替えは原子的です。
+
+ワーカー側は SATEI_MODEL=model_store/current.ref を指定するだけで、satei_cache の
+ModelWatcher が current.ref の変化を検知して新しい版をマップし直します。処理中のリクエストは
+取得済みの古い版で完了し、以降のリクエストから新しい版を使います。
+
+使い方:
+    python satei_shared.py publish                 # satei_model.txt を新しい版として公開
+    python satei_shared.py watch                   # モデルファイルの更新を監視して自動公開
+    python satei_shared.py bench --workers 4       # プロセスごとの RSS とリロード時間
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from satei_core import LGB_MODEL_PATH
+
+STORE_DIR = os.path.join(os.path.dirname(LGB_MODEL_PATH), 'model_store')
+CURRENT_REF = os.path.join(STORE_DIR, 'current.ref')
+DEFAULT_KEEP = 3
+
+
+def _versions_dir(store):
+    return os.path.join(store, 'versions')
+
+
+def publish(src=LGB_MODEL_PATH, store=STORE_DIR, keep=DEFAULT_KEEP):
+    """src のモデルを新しい版として書き出し、current.ref を差し替える。版名を返す。"""
+    from satei_cache import file_hash
+    from satei_core import load_model
+    from satei_fast import compile_booster, expand_arrays
+
+    arrays = compile_booster(load_model(src))
+    arrays.update(expand_arrays(arrays))
+
+    version = f"{time.time_ns()}-{file_hash(src)[:12]}"    # 先頭の時刻で並べると公開順になる
+    versions = _versions_dir(store)
+    tmp_dir = os.path.join(versions, version + '.tmp')
+    os.makedirs(tmp_dir)
+    try:
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp_dir, name + '.npy'), arr)
+        os.rename(tmp_dir, os.path.join(versions, version))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)    # 古い版の削除は .tmp を対象外にしているので、ここで消す
+        raise
+
+    tmp_ref = os.path.join(store, 'current.ref.tmp')
+    with open(tmp_ref, 'w') as f:
+        f.write(version)
+    os.replace(tmp_ref, os.path.join(store, 'current.ref'))
+
+    # 古い版を削除（マップ中のプロセスがあってもファイルの実体は閉じるまで残る）
+    old = sorted(v for v in os.listdir(versions) if not v.endswith('.tmp') and v != version)
+    for v in old[:max(0, len(old) - (keep - 1))]:
+        shutil.rmtree(os.path.join(versions, v), ignore_errors=True)
+    return version
+
+
+def load_ref(path=CURRENT_REF):
+    """current.ref が指す版を読み取り専用でメモリマップした ArrayPredictor を返す。"""
+    from satei_fast import ArrayPredictor
+
+    with open(path) as f:
+        version = f.read().strip()
+    version_dir = os.path.join(_versions_dir(os.path.dirname(path)), version)
+    arrays = {os.path.splitext(name)[0]: np.load(os.path.join(version_dir, name), mmap_mode='r')
+              for name in os.listdir(version_dir)}
+    predictor = ArrayPredictor(arrays)
+    predictor.version = version
+    return predictor
+
+
+def watch(src=LGB_MODEL_PATH, store=STORE_DIR, interval=2.0):
+    """src の内容が変わるたびに publish する（Ctrl+C で終了）。"""
+    from satei_cache import file_hash
+
+    # 既に公開済みの版と同じ内容なら再起動しても公開し直さない（版名の末尾がハッシュの先頭12桁）
+    last = None
+    ref = os.path.join(store, 'current.ref')
+    if os.path.exists(ref):
+        with open(ref) as f:
+            last = f.read().strip().rpartition('-')[2] or None
+    failed = None
+    while True:
+        try:
+            digest = file_hash(src)
+        except OSError:
+            digest = None    # 差し替え中（削除→配置）の瞬間は次の周期で拾う
+        if digest is not None and digest[:12] != last and digest != failed:
+            start = time.perf_counter()
+            try:
+                version = publish(src, store)
+            except Exception as e:
+                # 書き込み途中のファイルなどは読み込みに失敗する。監視は止めない
+                # 内容が同じままなら同じ失敗を繰り返すだけなので、ファイルが変わってから再試行する
+                print(f"公開できませんでした（ファイルが更新されたら再試行）: {e}", file=sys.stderr, flush=True)
+                failed = digest
+            else:
+                print(f"公開しました: {version} ({(time.perf_counter() - start) * 1e3:.0f} ms)", flush=True)
+                last = version.rpartition('-')[2]    # publish が実際に読んだ内容のハッシュ
+        time.sleep(interval)
+
+
+def process_memory():
+    """このプロセスの RSS（全体・無名メモリ・ファイルマップ）を KB で返す（Linux の /proc を使用）。"""
+    usage = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'RssAnon', 'RssFile', 'RssShmem'):
+                usage[key] = int(value.split()[0])
+    return usage
+
+
+def _bench_worker(model_path, ready, out):
+    # 1プロセス分：モデルを読み込み、1件推論した後のメモリ使用量を返す
+    from satei_core import load_model, predict_price, make_address
+    model = load_model(model_path)
+    predict_price(model, '新宿区', make_address('新宿区', '西新宿'), 60, 5, 2015)
+    out.put(process_memory())
+    ready.wait()
+
+
+def _measure_workers(model_path, workers):
+    import multiprocessing as mp
+    ctx = mp.get_context('spawn')
+    ready, out = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=_bench_worker, args=(model_path, ready, out)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    usages = [out.get() for _ in procs]
+    ready.set()
+    for p in procs:
+        p.join()
+    return usages
+
+
+def bench(workers=4, store=STORE_DIR):
+    from satei_cache import ModelWatcher
+
+    ref = os.path.join(store, 'current.ref')
+    if not os.path.exists(ref):
+        publish(store=store)
+
+    print(f"プロセスごとのメモリ（{workers} プロセス・KB・中央値）")
+    for label, path in (("LightGBM（各プロセスで読み込み）", LGB_MODEL_PATH), ("共有モデル（mmap）", ref)):
+        usages = _measure_workers(path, workers)
+        med = {k: sorted(u.get(k, 0) for u in usages)[len(usages) // 2] for k in usages[0]}
+        print(f"  {label:<28} RSS {med['VmRSS']:>8,}  無名 {med.get('RssAnon', 0):>8,}  ファイル {med.get('RssFile', 0):>8,}")
+
+    watcher = ModelWatcher(ref)
+    start = time.perf_counter()
+    version = publish(store=store)
+    publish_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    model = watcher.get()
+    switch_seconds = time.perf_counter() - start
+    assert model.version == version
+    print(f"リロード: 公開 {publish_seconds * 1e3:.0f} ms / ワーカーの切り替え {switch_seconds * 1e3:.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="共有メモリのモデルストア")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('publish', help="モデルを新しい版として公開する")
+    p.add_argument('--src', default=LGB_MODEL_PATH)
+    p.add_argument('--store', default=STORE_DIR)
+    p.add_argument('--keep', type=int, default=DEFAULT_KEEP, help="残しておく版の数")
+    p = sub.add_parser('watch', help="モデルファイルの更新を監視して自動で公開する")
+    p.add_argument('--src', default=LGB_MODEL_PATH)
+    p.add_argument('--store', default=STORE_DIR)
+    p.add_argument('--interval', type=float, default=2.0, help="確認間隔（秒）")
+    p = sub.add_parser('bench', help="プロセスごとの RSS とリロード時間を計測する")
+    p.add_argument('--workers', type=int, default=4)
+    p.add_argument('--store', default=STORE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == 'publish':
+        print(f"公開しました: {publish(args.src, args.store, args.keep)}")
+    elif args.command == 'watch':
+        try:
+            watch(args.src, args.store, args.interval)
+        except KeyboardInterrupt:
+            pass
+    else:
+        bench(args.workers, args.store)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""モデルの形式変換とコールドスタートの計測。
+
+satei_model.pkl（pickle）を LightGBM ネイティブのテキスト形式 satei_model.txt に書き出します。
+テキスト形式は lightgbm / scikit-learn のバージョンが変わっても読み込めます。
+さらに速く起動したい場合は satei_fast.py で .npz（lightgbm / pandas 不要）に変換し、
+環境変数 SATEI_MODEL=satei_model.npz で指定します。
+
+使い方:
+    python satei_startup.py export          # satei_model.pkl -> satei_model.txt
+    python satei_startup.py bench           # 形式ごとの import / 読み込み / 初回推論の時間
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from satei_core import LGB_MODEL_PATH, PICKLE_MODEL_PATH
+
+# 新しいプロセスで「import → モデル読み込み → 初回推論」を計測する
+_CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+path = sys.argv[1]
+if not path.endswith('.npz'):
+    import pandas, lightgbm
+import numpy
+from satei_core import load_model, predict_price, make_address
+t1 = time.perf_counter()
+model = load_model(path)
+t2 = time.perf_counter()
+predict_price(model, '新宿区', make_address('新宿区', '西新宿'), 60, 5, 2015)
+t3 = time.perf_counter()
+print(json.dumps({'import': t1 - t0, 'load': t2 - t1, 'first_predict': t3 - t2}))
+'''
+
+
+def export_model(src=PICKLE_MODEL_PATH, dst=LGB_MODEL_PATH):
+    from satei_core import load_model
+    load_model(src).save_model(dst)
+    return dst
+
+
+def measure(path, runs=5):
+    """path のモデルでコールドスタートを runs 回計測し、各段階の中央値（秒）を返す。"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', _CHILD, path], cwd=here,
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {k: sorted(r[k] for r in results)[len(results) // 2] for k in results[0]}
+
+
+def bench(paths, runs=5):
+    print(f"{'形式':<24}{'import':>10}{'読み込み':>10}{'初回推論':>10}{'合計':>10}  (ms, {runs} 回の中央値)")
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"{os.path.basename(path):<24}  （ファイルがありません）")
+            continue
+        r = measure(path, runs)
+        total = sum(r.values())
+        print(f"{os.path.basename(path):<24}{r['import'] * 1e3:>10.1f}{r['load'] * 1e3:>10.1f}"
+              f"{r['first_predict'] * 1e3:>10.1f}{total * 1e3:>10.1f}")
+
+
+def main(argv=None):
+    from satei_fast import COMPILED_PATH
+
+    parser = argparse.ArgumentParser(description="モデル形式の変換とコールドスタート計測")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('export', help="pickle を LightGBM ネイティブ形式に書き出す")
+    p.add_argument('--src', default=PICKLE_MODEL_PATH)
+    p.add_argument('--dst', default=LGB_MODEL_PATH)
+    p = sub.add_parser('bench', help="形式ごとのコールドスタート時間を計測する")
+    p.add_argument('--runs', type=int, default=5)
+    p.add_argument('paths', nargs='*', default=[PICKLE_MODEL_PATH, LGB_MODEL_PATH, COMPILED_PATH])
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        dst = export_model(args.src, args.dst)
+        print(f"書き出しました: {dst} ({os.path.getsize(dst) / 1024:.0f} KB)")
+    else:
+        bench(args.paths, args.runs)
+
+
+if __name__ == '__main__':
+    main()
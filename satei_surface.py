@@ -0,0 +1,182 @@
+"""町名別の価格サーフェス（事前計算テーブル）。
+
+全ての区・町名 × 面積・徒歩・築年のグリッドをオフラインで一括推論し、
+価格と利回りを .npy（メモリマップ可能）に保存します。app.py などからはモデルを読み込まずに
+任意のセルを引いたり、セルの間を線形補間したりできます。
+
+使い方:
+    python satei_surface.py build                   # price_surface/ を生成
+    python satei_surface.py build --workers 8 --area-step 5
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from satei_core import LGB_MODEL_PATH, MODEL_PATH, INPUT_RANGES, predict_price, make_address, calc_yield
+from satei_cache import file_hash
+from satei_data import town_data
+
+SURFACE_DIR = os.path.join(os.path.dirname(LGB_MODEL_PATH), 'price_surface')    # SATEI_MODEL によらずリポジトリ直下
+
+DEFAULT_AREA_STEP = 10
+DEFAULT_WALK_STEP = 5
+DEFAULT_YEAR_STEP = 5
+
+
+def make_axes(area_step=DEFAULT_AREA_STEP, walk_step=DEFAULT_WALK_STEP, year_step=DEFAULT_YEAR_STEP):
+    # app.py の入力範囲（面積 10〜300・徒歩 0〜30・築年 1970〜2025）を両端を含めて刻む
+    def axis(lo, hi, step):
+        return np.unique(np.append(np.arange(lo, hi + 1, step), hi))
+    return (axis(*INPUT_RANGES['area'], area_step), axis(*INPUT_RANGES['walk'], walk_step),
+            axis(*INPUT_RANGES['year'], year_step))
+
+
+# --- 並列ビルド用（ワーカープロセスごとにモデルを1回だけ読み込む） ---
+_worker_model = None
+
+
+def _init_worker(model_path):
+    global _worker_model
+    from satei_core import load_model
+    _worker_model = load_model(model_path)
+
+
+def _predict_towns(towns, area_axis, walk_axis, year_axis):
+    # towns: [(区, 町名), ...] の各町について、グリッド全体を1回の predict で推論する
+    a, w, y = np.meshgrid(area_axis, walk_axis, year_axis, indexing='ij')
+    cells = a.size
+    ku = np.repeat(np.array([k for k, _ in towns], dtype=object), cells)
+    town = np.repeat(np.array([t for _, t in towns], dtype=object), cells)
+    area = np.tile(a.ravel(), len(towns))
+    walk = np.tile(w.ravel(), len(towns))
+    year = np.tile(y.ravel(), len(towns))
+    price = predict_price(_worker_model, ku, make_address(ku, town), area, walk, year)
+    return price.reshape(len(towns), *a.shape).astype(np.float32)
+
+
+def build_surface(dst=SURFACE_DIR, model_path=MODEL_PATH, workers=None, chunk_towns=32,
+                  area_step=DEFAULT_AREA_STEP, walk_step=DEFAULT_WALK_STEP, year_step=DEFAULT_YEAR_STEP):
+    """グリッド全体を並列に推論して dst に保存する。ビルド時間とファイルサイズを dict で返す。"""
+    start = time.perf_counter()
+    area_axis, walk_axis, year_axis = make_axes(area_step, walk_step, year_step)
+    towns = [(ku, town) for ku, names in town_data.items() for town in names]
+    chunks = [towns[i:i + chunk_towns] for i in range(0, len(towns), chunk_towns)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+        parts = pool.map(_predict_towns, chunks, *([axis] * len(chunks) for axis in (area_axis, walk_axis, year_axis)))
+        price = np.concatenate(list(parts))
+
+    # 利回りは区の賃料係数・面積・築年から決まるので、価格テンソルと同じ形で一括計算する
+    ku = np.array([k for k, _ in towns], dtype=object)
+    yield_rate = calc_yield(
+        np.broadcast_to(ku[:, None, None, None], price.shape).ravel(),
+        np.broadcast_to(area_axis[None, :, None, None], price.shape).ravel(),
+        np.broadcast_to(year_axis[None, None, None, :], price.shape).ravel(),
+        price.ravel().astype(np.float64),
+    ).reshape(price.shape).astype(np.float32)
+
+    # 実行中のアプリがメモリマップしているファイルを上書きしないよう、別名で書いてから置き換える。
+    # meta.json は最後に置き換えるので、その更新時刻が変わった時点で配列は書き終わっている
+    os.makedirs(dst, exist_ok=True)
+    for name, arr in (('price.npy', price), ('yield.npy', yield_rate)):
+        np.save(os.path.join(dst, name + '.tmp.npy'), arr)
+        os.replace(os.path.join(dst, name + '.tmp.npy'), os.path.join(dst, name))
+    meta = {
+        'towns': towns,
+        'area': area_axis.tolist(),
+        'walk': walk_axis.tolist(),
+        'year': year_axis.tolist(),
+        'model': os.path.basename(model_path),
+        'model_hash': file_hash(model_path),    # app.py で読み込み中のモデルと同じか確認するため
+    }
+    with open(os.path.join(dst, 'meta.json.tmp'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(os.path.join(dst, 'meta.json.tmp'), os.path.join(dst, 'meta.json'))
+
+    size = sum(os.path.getsize(os.path.join(dst, name)) for name in ('price.npy', 'yield.npy', 'meta.json'))
+    return {'seconds': time.perf_counter() - start, 'bytes': size, 'shape': price.shape}
+
+
+class PriceSurface:
+    """build_surface() の出力をメモリマップで開き、セル参照・補間・町名比較を行う。"""
+
+    def __init__(self, path=SURFACE_DIR):
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.price = np.load(os.path.join(path, 'price.npy'), mmap_mode='r')
+        self.yield_rate = np.load(os.path.join(path, 'yield.npy'), mmap_mode='r')
+        self.towns = [tuple(t) for t in meta['towns']]
+        self.town_index = {t: i for i, t in enumerate(self.towns)}
+        self.area_axis = np.array(meta['area'])
+        self.walk_axis = np.array(meta['walk'])
+        self.year_axis = np.array(meta['year'])
+        self.model_hash = meta.get('model_hash')
+
+    @staticmethod
+    def exists(path=SURFACE_DIR):
+        return os.path.exists(os.path.join(path, 'meta.json'))
+
+    @staticmethod
+    def version(path=SURFACE_DIR):
+        """meta.json の更新時刻（無ければ None）。作り直されたかどうかの判定に使う。"""
+        try:
+            return os.stat(os.path.join(path, 'meta.json')).st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def _nearest(axis, value):
+        return int(np.abs(axis - value).argmin())
+
+    def lookup(self, ku, town, area, walk, year):
+        """最も近いグリッドセルの (価格, 利回り) を返す。"""
+        i = self.town_index[(ku, town)]
+        cell = (i, self._nearest(self.area_axis, area), self._nearest(self.walk_axis, walk),
+                self._nearest(self.year_axis, year))
+        return float(self.price[cell]), float(self.yield_rate[cell])
+
+    def interpolate(self, ku, town, area, walk, year):
+        """面積・徒歩・築年の3軸で線形補間した (価格, 利回り) を返す。利回りは補間後の価格から計算する。"""
+        table = self.price[self.town_index[(ku, town)]]
+        # グリッドの外はグリッドの端に寄せる（利回りも寄せた値で計算し、価格と条件をそろえる）
+        area, walk, year = (min(max(value, axis[0]), axis[-1]) for axis, value in
+                            zip((self.area_axis, self.walk_axis, self.year_axis), (area, walk, year)))
+        for axis, value in zip((self.area_axis, self.walk_axis, self.year_axis), (area, walk, year)):
+            hi = min(int(np.searchsorted(axis, value)), len(axis) - 1)
+            lo = max(hi - 1, 0)
+            t = 0.0 if hi == lo else (value - axis[lo]) / (axis[hi] - axis[lo])
+            table = (1 - t) * table[lo] + t * table[hi]
+        price = float(table)
+        return price, float(calc_yield(ku, area, year, price))
+
+    def town_prices(self, ku, area, walk, year):
+        """区内の全町名について最も近いセルの価格を返す（{町名: 価格}）。"""
+        a, w, y = (self._nearest(self.area_axis, area), self._nearest(self.walk_axis, walk),
+                   self._nearest(self.year_axis, year))
+        return {town: float(self.price[self.town_index[(ku, town)], a, w, y])
+                for town in town_data.get(ku, []) if (ku, town) in self.town_index}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="町名別の価格サーフェスを事前計算します。")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build')
+    p.add_argument('--dst', default=SURFACE_DIR)
+    p.add_argument('--model', default=MODEL_PATH)
+    p.add_argument('--workers', type=int, default=None, help="プロセス数（既定: CPU コア数）")
+    p.add_argument('--area-step', type=int, default=DEFAULT_AREA_STEP)
+    p.add_argument('--walk-step', type=int, default=DEFAULT_WALK_STEP)
+    p.add_argument('--year-step', type=int, default=DEFAULT_YEAR_STEP)
+    args = parser.parse_args(argv)
+
+    stats = build_surface(args.dst, args.model, args.workers,
+                          area_step=args.area_step, walk_step=args.walk_step, year_step=args.year_step)
+    print(f"完了: {args.dst} {stats['shape']} / {stats['seconds']:.1f} 秒 / {stats['bytes'] / 1024 / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()